@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import logging
+import time
+
+from aiocoap import resource
+from aiocoap.message import Message
+from aiocoap.numbers.codes import Code
+from aiocoap.protocol import Context
+
+from encdec import MediaType, TlvEncoder, TlvType
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s [%(levelname)s] %(message)s')
+log = logging.getLogger('bootstrap-server')
+
+
+def tlv_instance(resources):
+    _buf = bytearray()
+    for res, value in resources.items():
+        if isinstance(value, bool):
+            _payload = b'\x01' if value else b'\x00'
+        elif isinstance(value, int):
+            _payload = value.to_bytes(
+                int(value.bit_length() / 8) + 1, byteorder='big', signed=True)
+        else:
+            _payload = str(value).encode()
+        _buf.extend(TlvEncoder._pack(TlvType.RESOURCE_VALUE, res, _payload))
+    return bytes(_buf)
+
+
+class BootstrapRequestHandler(resource.Resource):
+    def __init__(self, server):
+        super(BootstrapRequestHandler, self).__init__()
+        self.server = server
+
+    async def render_post(self, request):
+        _query = dict(q.partition('=')[::2] for q in request.opt.uri_query)
+        if not _query.get('ep'):
+            return Message(code=Code.BAD_REQUEST)
+        log.debug(f'bootstrap request from {_query["ep"]} at {request.remote.hostinfo}')
+        asyncio.ensure_future(self.server.provision(_query['ep'], request.remote))
+        return Message(code=Code.CHANGED)
+
+
+class BootstrapServer(resource.Site):
+    """Minimal stand-in bootstrap server, provisioning every endpoint with the same server account."""
+
+    ssid = 1
+    context = None
+
+    def __init__(self, server_uri='coap://localhost:5683', lifetime=86400, binding='UQ', **kwargs):
+        super(BootstrapServer, self).__init__()
+        self.address = kwargs['address'] if 'address' in kwargs else '::'
+        self.port = kwargs['port'] if 'port' in kwargs else 5783
+        self.server_uri = server_uri
+        self.lifetime = lifetime
+        self.binding = binding
+        self.provisioned = 0
+        self.failed = 0
+        self.add_resource(('bs',), BootstrapRequestHandler(self))
+
+    async def send(self, remote, code, path, payload=b''):
+        request = Message(code=code, payload=payload,
+                          uri=f'coap://{remote.hostinfo}')
+        request.opt.uri_path = path
+        if payload:
+            request.opt.content_format = MediaType.TLV.value
+        response = await self.context.request(request).response
+        if not response.code.is_successful():
+            raise BaseException(
+                f'unexpected code received: {response.code} for {code} on /{"/".join(path)}')
+
+    async def provision(self, endpoint, remote):
+        started = time.monotonic()
+        try:
+            await self.send(remote, Code.DELETE, ())
+            # bootstrap server account
+            await self.send(remote, Code.PUT, ('0', '0'), tlv_instance(
+                {0: f'coap://localhost:{self.port}', 1: True, 2: 3}))
+            # LwM2M server account (NoSec) and its server object
+            await self.send(remote, Code.PUT, ('0', '1'), tlv_instance(
+                {0: self.server_uri, 1: False, 2: 3, 10: self.ssid}))
+            await self.send(remote, Code.PUT, ('1', '0'), tlv_instance(
+                {0: self.ssid, 1: self.lifetime, 6: False, 7: self.binding}))
+            await self.send(remote, Code.POST, ('bs',))
+        except BaseException as e:
+            self.failed += 1
+            log.error(f'bootstrap of {endpoint} failed: {e}')
+            return
+        self.provisioned += 1
+        log.info(f'provisioned {endpoint} in {(time.monotonic() - started) * 1000:.1f}ms '
+                 f'({self.provisioned} provisioned, {self.failed} failed)')
+
+    async def run(self):
+        self.context = await Context.create_server_context(self, bind=(self.address, self.port))
+        log.info(f'bootstrap server listening on port {self.port}, provisioning {self.server_uri}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('bootstrap-server')
+    parser.add_argument('--address', type=str, default='::',
+                        help='Address for bootstrap server to bind and listen for bootstrap requests')
+    parser.add_argument('--port', type=int, default=5783,
+                        help='Port for bootstrap server to listen for bootstrap requests')
+    parser.add_argument('--server-uri', type=str, default='coap://localhost:5683',
+                        help='LwM2M server URI provisioned to the clients')
+    parser.add_argument('--lifetime', type=int, default=86400,
+                        help='Registration lifetime provisioned to the clients')
+    parser.add_argument('--binding', type=str, default='UQ', choices=('U', 'UQ'),
+                        help='Binding mode provisioned to the clients')
+    args = parser.parse_args()
+
+    server = BootstrapServer(**vars(args))
+    loop = asyncio.get_event_loop()
+    asyncio.ensure_future(server.run())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        loop.close()
+        exit(0)
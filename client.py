@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 import argparse
+from urllib.parse import urlsplit
 
 from aiocoap import error, resource
 from aiocoap.message import Message
 from aiocoap.numbers.codes import Code
 from aiocoap.protocol import Context
 from aiocoap.resource import ObservableResource
+from aiocoap.util import hostportjoin
 
-from encdec import PayloadDecoder, PayloadEncoder
+from datasource import DataSourceManager
+from encdec import MediaType, PayloadDecoder, PayloadEncoder
 from handlers import *
 from model import ClientModel
+from queuemode import NotificationQueue, PacketStats
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s [%(levelname)s] %(message)s')
@@ -17,11 +21,22 @@ log = logging.getLogger('client')
 
 
 class RequestHandler(ObservableResource):
-    def __init__(self, model, encoder, decoder):
+    # notification attributes of Write-Attributes and their value types
+    attribute_types = dict(pmin=int, pmax=int, gt=float, lt=float, st=float)
+
+    def __init__(self, model, encoder, decoder, data_sources=None, site=None):
         super(RequestHandler, self).__init__()
         self.model = model
         self.encoder = encoder
         self.decoder = decoder
+        self.data_sources = data_sources
+        self.site = site
+        # per observed path: server observations as (remote, observation), time of the last
+        # notification, pending pmin and pmax timers
+        self.observers = dict()
+        self.notified = dict()
+        self.deferred = dict()
+        self.periodic = dict()
 
     def handle_read(self, path):
         return self.encoder.encode(path)
@@ -29,34 +44,151 @@ class RequestHandler(ObservableResource):
     def handle_write(self, path, payload, content_format):
         return self.decoder.decode(path, payload, content_format)
 
+    def handle_discover(self, path):
+        return self.encoder.discover(path)
+
+    def handle_write_attributes(self, path, query):
+        if len(path) not in (1, 2, 3):
+            return Message(code=Code.METHOD_NOT_ALLOWED)
+        if not self.model.is_path_valid(path):
+            return Message(code=Code.NOT_FOUND)
+        _attrs = dict()
+        for q in query:
+            name, _, value = q.partition('=')
+            if name not in self.attribute_types:
+                return Message(code=Code.BAD_REQUEST, payload=f'unknown attribute: {name}'.encode())
+            try:
+                _attrs[name] = self.attribute_types[name](value) if value else None
+            except ValueError:
+                return Message(code=Code.BAD_REQUEST, payload=f'invalid value for {name}: {value}'.encode())
+        self.model.set_attributes(path, _attrs)
+        return Message(code=Code.CHANGED)
+
+    @staticmethod
+    def observe_handler(path):
+        try:
+            return eval(f'observe_{"_".join(path)}')
+        except NameError:
+            return None
+
+    async def add_observation(self, req, serverobservation):
+        path, request = req
+        _path = tuple(str(p) for p in path)
+        _observer = (request.remote.hostinfo, serverobservation)
+        self.observers.setdefault(_path, list()).append(_observer)
+        # called by aiocoap when the observation ends, e.g. on a reset or a failed notification
+        serverobservation.accept(lambda: self.observation_removed(_path, _observer))
+
+    def observation_removed(self, path, observer):
+        _observers = self.observers.get(path, list())
+        if observer in _observers:
+            _observers.remove(observer)
+        if not _observers:
+            self.stop_observing(path)
+
     def handle_observe(self, path, request):
-        plen = len(path)
-        if plen == 1:
-            obs = f'observe_{path[0]}'
-        elif plen == 2:
-            obs = f'observe_{path[0]}_{path[1]}'
-        elif plen == 3:
-            obs = f'observe_{path[0]}_{path[1]}_{path[2]}'
-        else:
+        if len(path) not in (1, 2, 3):
             return Message(code=Code.BAD_REQUEST)
+        _path = tuple(str(p) for p in path)
+        if request.opt.observe == 1:
+            # Cancel Observation: forget the observations of the requesting server on this path
+            for _observer in [o for o in self.observers.get(_path, list()) if o[0] == request.remote.hostinfo]:
+                self.observation_removed(_path, _observer)
+            return self.encoder.encode(path)
+        if _path in self.notified:
+            # already observed, e.g. by another server
+            return self.encoder.encode(path)
+
+        def _send():
+            _response = self.encoder.encode(path)
+            for _, serverobservation in self.observers.get(_path, list()):
+                serverobservation.trigger(_response)
 
         def _notifier():
-            self.updated_state(response=self.encoder.encode(path))
+            self.notify(_path, _send)
 
-        try:
-            obs_method = eval(obs)
-            cancel = request.opt.observe == '0'
+        obs_method = self.observe_handler(_path)
+        if obs_method is not None:
             _kwargs = dict(model=self.model,
                            path=path,
                            payload=request.payload,
                            content_format=request.opt.content_format,
-                           cancel=cancel,
+                           cancel=False,
                            notifier=_notifier)
             obs_method(None, **_kwargs)
-            return self.encoder.encode(path)
-        except NameError:
-            pass
-        return Message(code=Code.METHOD_NOT_ALLOWED)
+        elif self.data_sources is not None and self.data_sources.has_source(path):
+            # no observe handler, but values are fed by a data source
+            self.data_sources.observe(path, _notifier)
+        else:
+            return Message(code=Code.METHOD_NOT_ALLOWED)
+        # the response to the observe request counts as the first notification
+        self.notified[_path] = time.monotonic()
+        self.schedule_pmax(_path, _send)
+        return self.encoder.encode(path)
+
+    def stop_observing(self, path):
+        self.observers.pop(path, None)
+        for timers in (self.deferred, self.periodic):
+            if path in timers:
+                timers.pop(path).cancel()
+        if self.notified.pop(path, None) is None:
+            # observation was never established
+            return
+        log.debug(f'no more observers on {"/".join(path)}')
+        if self.site is not None:
+            self.site.discard_notification(path)
+        obs_method = self.observe_handler(path)
+        if obs_method is not None:
+            obs_method(None, model=self.model, path=path, payload=b'', content_format=None,
+                       cancel=True, notifier=lambda: None)
+        elif self.data_sources is not None:
+            self.data_sources.observe(path, None, cancel=True)
+
+    def instance_deleted(self, obj, inst):
+        # observations below a deleted instance end with 4.04
+        for _path in [p for p in set(self.observers) | set(self.notified) if p[:2] == (str(obj), str(inst))]:
+            for _, serverobservation in self.observers.get(_path, list()):
+                serverobservation.trigger(Message(code=Code.NOT_FOUND))
+            self.stop_observing(_path)
+
+    def notification_attributes(self, path):
+        # attributes of a resource take precedence over those of its instance and object
+        _attrs = dict()
+        for i in range(1, len(path) + 1):
+            _attrs.update(self.model.get_attributes(path[:i]))
+        return _attrs
+
+    def schedule_pmax(self, path, send):
+        if path in self.periodic:
+            self.periodic.pop(path).cancel()
+        _pmax = self.notification_attributes(path).get('pmax')
+        if _pmax:
+            # no notification within pmax, send the current value anyway
+            self.periodic[path] = asyncio.get_event_loop().call_later(_pmax, self.notify, path, send)
+
+    def notify(self, path, send):
+        _path = tuple(str(p) for p in path)
+        if _path not in self.notified:
+            # no longer observed, e.g. a late notification of a cancelled observe handler
+            return
+        _pmin = self.notification_attributes(_path).get('pmin')
+        _elapsed = time.monotonic() - self.notified.get(_path, 0)
+        if _pmin and _elapsed < _pmin:
+            # too early, send a single notification with the latest value once pmin has passed
+            if _path not in self.deferred:
+                self.deferred[_path] = asyncio.get_event_loop().call_later(
+                    _pmin - _elapsed, self.notify_deferred, _path, send)
+            return
+        self.notified[_path] = time.monotonic()
+        self.schedule_pmax(_path, send)
+        if self.site is not None:
+            self.site.notify(_path, send)
+        else:
+            send()
+
+    def notify_deferred(self, path, send):
+        self.deferred.pop(path, None)
+        self.notify(path, send)
 
     def handle_exec(self, path, request):
         if len(path) != 3 or not self.model.is_path_valid(path):
@@ -75,6 +207,98 @@ class RequestHandler(ObservableResource):
         result = _op_method(None, **_kwargs)
         return Message(code=Code.CHANGED, payload=result) if result is not None else Message(code=Code.CHANGED)
 
+    def handle_create(self, path, request):
+        if not self.model.has_definition(path[0]):
+            return Message(code=Code.NOT_FOUND)
+        if int(path[0]) == 0:
+            # security object is managed by bootstrap only
+            return Message(code=Code.METHOD_NOT_ALLOWED)
+        message, _instances = self.decoder.decode_instances(
+            path, request.payload, request.opt.content_format)
+        if message.code != Code.CREATED:
+            return message
+        _new_object = int(path[0]) not in self.model.objects()
+        _created = list()
+        try:
+            for _inst, _resources in _instances:
+                self.model.check_instance(path[0], _resources)
+            for _inst, _resources in _instances:
+                _created.append(self.model.create_instance(
+                    path[0], _inst, _resources))
+        except AttributeError as e:
+            log.warning(f'create on {"/".join(path)} failed: {e}')
+            # all or nothing: roll back instances created by this request
+            for _inst in _created:
+                self.model.delete_instance(path[0], _inst)
+            if _new_object and int(path[0]) in self.model.objects():
+                self.model.delete_object(path[0])
+            return Message(code=Code.BAD_REQUEST, payload=str(e).encode())
+        if self.site is not None:
+            self.site.instances_changed(
+                created=[(path[0], _inst) for _inst in _created])
+        message.opt.location_path = (path[0], _created[0])
+        return message
+
+    def handle_bootstrap_write(self, path, request):
+        if len(path) not in (1, 2) or not self.model.has_definition(path[0]):
+            return Message(code=Code.BAD_REQUEST)
+        message, _instances = self.decoder.decode_instances(
+            path, request.payload, request.opt.content_format)
+        if message.code != Code.CREATED:
+            return message
+        _created = list()
+        try:
+            for _inst, _resources in _instances:
+                if _inst is not None and self.model.is_path_valid((path[0], _inst)):
+                    self.model.apply({path[0]: {_inst: _resources}})
+                else:
+                    _created.append(self.model.create_instance(
+                        path[0], _inst, _resources))
+        except AttributeError as e:
+            log.warning(f'bootstrap write on {"/".join(path)} failed: {e}')
+            message = Message(code=Code.BAD_REQUEST, payload=str(e).encode())
+        else:
+            message = Message(code=Code.CHANGED)
+        if _created and self.site is not None:
+            self.site.instances_changed(
+                created=[(path[0], _inst) for _inst in _created])
+        return message
+
+    def handle_bootstrap_delete(self, path):
+        if len(path) > 2:
+            return Message(code=Code.BAD_REQUEST)
+        if len(path) > 0 and not self.model.is_path_valid(path):
+            return Message(code=Code.NOT_FOUND)
+        _deleted = list()
+        for obj in self.model.objects() if len(path) == 0 else [int(path[0])]:
+            for inst in self.model.instances(obj) if len(path) < 2 else [int(path[1])]:
+                # bootstrap server account and device object are never deleted
+                if obj == 3 or (obj == 0 and self.model.is_bootstrap_account(inst)):
+                    continue
+                _deleted.append(
+                    (str(obj), str(inst), self.model.resources(obj, inst)))
+                self.model.delete_instance(obj, inst)
+                self.instance_deleted(obj, inst)
+        if _deleted and self.site is not None:
+            self.site.instances_changed(deleted=_deleted)
+        return Message(code=Code.DELETED)
+
+    def handle_delete(self, path):
+        if len(path) != 2:
+            return Message(code=Code.METHOD_NOT_ALLOWED)
+        if int(path[0]) in (0, 3):
+            # security object is managed by bootstrap only, device object is mandatory
+            return Message(code=Code.METHOD_NOT_ALLOWED)
+        if not self.model.is_path_valid(path):
+            return Message(code=Code.NOT_FOUND)
+        _resources = self.model.resources(path[0], path[1])
+        self.model.delete_instance(path[0], path[1])
+        self.instance_deleted(path[0], path[1])
+        if self.site is not None:
+            self.site.instances_changed(
+                deleted=[(path[0], path[1], _resources)])
+        return Message(code=Code.DELETED)
+
     async def render(self, req):
         path, request = req
         m = getattr(self, 'render_%s' % str(request.code).lower(), None)
@@ -83,7 +307,10 @@ class RequestHandler(ObservableResource):
         return await m(path, request)
 
     async def render_get(self, path, request):
-        if request.opt.observe is not None:
+        if request.opt.accept == MediaType.LINK.value:
+            log.debug(f'discover on {"/".join(path)}')
+            return self.handle_discover(path)
+        elif request.opt.observe is not None:
             log.debug(f'observe on {"/".join(path)}')
             return self.handle_observe(path, request)
         else:
@@ -91,6 +318,9 @@ class RequestHandler(ObservableResource):
             return self.handle_read(path)
 
     async def render_put(self, path, request):
+        if request.opt.uri_query and not request.payload:
+            log.debug(f'write attributes on {"/".join(path)}')
+            return self.handle_write_attributes(path, request.opt.uri_query)
         log.debug(f'write on {"/".join(path)}')
         message, _decoded = self.handle_write(
             path, request.payload, request.opt.content_format)
@@ -99,9 +329,16 @@ class RequestHandler(ObservableResource):
         return message
 
     async def render_post(self, path, request):
+        if len(path) == 1 or (len(path) == 2 and not self.model.is_path_valid(path)):
+            log.debug(f'create on {"/".join(path)}')
+            return self.handle_create(path, request)
         log.debug(f'execute on {"/".join(path)}')
         return self.handle_exec(path, request)
 
+    async def render_delete(self, path, request):
+        log.debug(f'delete on {"/".join(path)}')
+        return self.handle_delete(path)
+
 
 class Client(resource.Site):
     endpoint = 'python-client'
@@ -109,61 +346,249 @@ class Client(resource.Site):
     lifetime = 86400  # default: 86400
     context = None
     rd_resource = None
+    links_update = None
+    online = False
+    sleep_handle = None
+    bootstrapping = False
+    update_task = None
+    registration = None
+    bootstrap_done = None
+    bootstrap_timeout = 60
 
     def __init__(self, model=ClientModel(), server='localhost', server_port=5683, **kwargs):
         super(Client, self).__init__()
         self.server = server
         self.server_port = server_port
         self.address = kwargs['address'] if 'address' in kwargs else '::'
+        self.endpoint = kwargs['endpoint'] if 'endpoint' in kwargs else self.endpoint
+        self.bootstrap_server = None
+        if kwargs.get('bootstrap'):
+            _bs = urlsplit(f'coap://{kwargs["bootstrap"]}')
+            self.bootstrap_server = _bs.hostname
+            self.bootstrap_port = _bs.port or 5683
+        self.binding_mode = kwargs['binding'] if 'binding' in kwargs else self.binding_mode
+        # queue mode: seconds to stay reachable after an update, seconds between wake-ups
+        self.awake_time = kwargs['awake_time'] if 'awake_time' in kwargs else 93
+        self.sleep_time = kwargs['sleep_time'] if 'sleep_time' in kwargs else 300
+        self.queue = NotificationQueue(kwargs['queue_size'] if 'queue_size' in kwargs else 32)
+        self.stats = PacketStats(self.binding_mode)
         self.model = model
         self.encoder = PayloadEncoder(model)
         self.decoder = PayloadDecoder(model)
+        self.data_sources = DataSourceManager(model)
         self.request_handler = RequestHandler(
-            self.model, self.encoder, self.decoder)
+            self.model, self.encoder, self.decoder, self.data_sources, self)
         for path in model.instance_iter():
             self.add_resource(path, self.request_handler)
         for path in model.resource_iter():
             self.add_resource(path, self.request_handler)
 
+    def instances_changed(self, created=(), deleted=()):
+        for obj, inst in created:
+            self.add_resource((obj, inst), self.request_handler)
+            for res in self.model.resources(obj, inst):
+                self.add_resource((obj, inst, str(res)), self.request_handler)
+        for obj, inst, resources in deleted:
+            self.remove_resource((obj, inst))
+            for res in resources:
+                self.remove_resource((obj, inst, str(res)))
+        # changes made while an update is pending are sent along with it
+        if self.rd_resource is not None and self.links_update is None:
+            self.links_update = asyncio.ensure_future(self.update_links())
+
+    def notify(self, path, send):
+        if self.online:
+            self.stats.count('notify')
+            send()
+        else:
+            self.queue.put(path, send)
+
+    def discard_notification(self, path):
+        # path is no longer observed, do not wake up for a queued notification
+        self.queue.discard(path)
+
+    def awake(self):
+        self.online = True
+        if self.sleep_handle is not None:
+            self.sleep_handle.cancel()
+            self.sleep_handle = None
+        _flushed = self.queue.flush()
+        if _flushed:
+            self.stats.count('notify', _flushed)
+            log.info(f'flushed {_flushed} queued notifications')
+        log.info(f'packet stats: {self.stats}')
+        if self.binding_mode == 'UQ':
+            self.sleep_handle = asyncio.get_event_loop().call_later(self.awake_time, self.sleep)
+
+    def sleep(self):
+        self.online = False
+        log.info(f'queue mode: sleeping for {self.sleep_time}s')
+        self.sleep_handle = asyncio.get_event_loop().call_later(self.sleep_time, self.wake_up)
+
+    def wake_up(self):
+        if len(self.queue) == 0:
+            # nothing to send, keep sleeping until the next wake-up or registration update
+            self.sleep()
+            return
+        self.sleep_handle = None
+        asyncio.ensure_future(self.update_queued())
+
+    async def update_queued(self):
+        log.debug('update_queued()')
+        response = await self.send_update()
+        if response.code != Code.CHANGED:
+            log.warning(
+                f'failed to update registration, code {response.code}, falling back to registration')
+            self.register_again()
+        else:
+            self.awake()
+
+    async def add_observation(self, request, serverobservation):
+        uri_path = request.opt.uri_path
+        if not self.bootstrapping and len(uri_path) > 0:
+            await self.request_handler.add_observation((uri_path, request,), serverobservation)
+
     async def render(self, request):
         uri_path = request.opt.uri_path
-        if len(uri_path) == 0:
+        if self.bootstrapping:
+            return self.render_bootstrap(uri_path, request)
+        elif len(uri_path) == 0:
             return await super().render(request)
         else:
             return await self.request_handler.render((uri_path, request,))
 
-    async def update_register(self):
-        log.debug('update_register()')
+    def render_bootstrap(self, path, request):
+        if request.code == Code.POST and tuple(path) == ('bs',):
+            log.info('bootstrap finished')
+            self.bootstrap_done.set()
+            return Message(code=Code.CHANGED)
+        elif request.code == Code.PUT:
+            log.debug(f'bootstrap write on {"/".join(path)}')
+            return self.request_handler.handle_bootstrap_write(path, request)
+        elif request.code == Code.DELETE:
+            log.debug(f'bootstrap delete on {"/".join(path)}')
+            return self.request_handler.handle_bootstrap_delete(path)
+        return Message(code=Code.METHOD_NOT_ALLOWED)
+
+    async def bootstrap(self):
+        log.debug('bootstrap()')
+        self.bootstrapping = True
+        self.bootstrap_done = asyncio.Event()
+        request = Message(code=Code.POST,
+                          uri=f'coap://{hostportjoin(self.bootstrap_server, self.bootstrap_port)}')
+        request.opt.uri_host = self.bootstrap_server
+        request.opt.uri_port = self.bootstrap_port
+        request.opt.uri_path = ('bs',)
+        request.opt.uri_query = (f'ep={self.endpoint}',)
+        self.stats.count('bootstrap')
+        try:
+            response = await self.context.request(request).response
+            if response.code != Code.CHANGED:
+                raise BaseException(
+                    f'unexpected code received: {response.code}. Unable to bootstrap!')
+            await asyncio.wait_for(self.bootstrap_done.wait(), self.bootstrap_timeout)
+            self.apply_server_account()
+        except BaseException as e:
+            # not bootstrapped, so that the next start() requests a bootstrap again
+            self.bootstrap_done = None
+            if isinstance(e, asyncio.TimeoutError):
+                raise BaseException(
+                    f'bootstrap not finished within {self.bootstrap_timeout}s. Unable to bootstrap!')
+            raise
+        finally:
+            self.bootstrapping = False
+
+    def apply_server_account(self):
+        # use the first LwM2M server account provisioned in /0 and its server object in /1
+        for inst in self.model.instances(0) if 0 in self.model.objects() else []:
+            if self.model.is_bootstrap_account(inst):
+                continue
+            for _res in (0, 10):
+                if not self.model.is_path_valid((0, inst, _res)):
+                    raise BaseException(f'missing resource /0/{inst}/{_res}. Unable to bootstrap!')
+            _uri = urlsplit(self.model.resource(0, inst, 0))
+            _ssid = self.model.resource(0, inst, 10)
+            _servers = [_srv for _srv in (self.model.instances(1) if 1 in self.model.objects() else [])
+                        if self.model.is_path_valid((1, _srv, 0)) and self.model.resource(1, _srv, 0) == _ssid]
+            if not _servers:
+                raise BaseException(f'no server object for short server id {_ssid}. Unable to bootstrap!')
+            for _res in (1, 7):
+                if not self.model.is_path_valid((1, _servers[0], _res)):
+                    raise BaseException(f'missing resource /1/{_servers[0]}/{_res}. Unable to bootstrap!')
+            self.server = _uri.hostname
+            self.server_port = _uri.port or 5683
+            self.lifetime = self.model.resource(1, _servers[0], 1)
+            self.binding_mode = self.model.resource(1, _servers[0], 7)
+            self.stats.mode = self.binding_mode
+            log.info(
+                f'bootstrapped server coap://{hostportjoin(self.server, self.server_port)}, lifetime {self.lifetime}, binding {self.binding_mode}')
+            return
+        raise BaseException('no LwM2M server account provisioned. Unable to bootstrap!')
+
+    async def send_update(self, links=False):
         update = Message(
-            code=Code.POST, uri=f'coap://{self.server}:{self.server_port}')
+            code=Code.POST, uri=f'coap://{hostportjoin(self.server, self.server_port)}')
+        if links:
+            update.payload = self.model.object_links().encode()
+            update.opt.content_format = MediaType.LINK.value
         update.opt.uri_host = self.server
         update.opt.uri_port = self.server_port
         update.opt.uri_path = ('rd', self.rd_resource)
-        response = await self.context.request(update).response
+        self.stats.count('update')
+        return await self.context.request(update).response
+
+    async def update_links(self):
+        # yield, so that instances created or deleted by the same request are included
+        await asyncio.sleep(0)
+        self.links_update = None
+        log.debug('update_links()')
+        response = await self.send_update(links=True)
+        if response.code != Code.CHANGED:
+            log.warning(
+                f'failed to update object links, code {response.code}, falling back to registration')
+            self.register_again()
+        else:
+            log.info(f'updated object links for {self.rd_resource}')
+            self.awake()
+
+    async def update_register(self):
+        log.debug('update_register()')
+        response = await self.send_update()
         if response.code != Code.CHANGED:
             # error while update, fallback to re-register
             log.warning(
                 f'failed to update registration, code {response.code}, falling back to registration')
-            asyncio.ensure_future(self.run())
-        else:
-            log.info(f'updated registration for {self.rd_resource}')
-            # yield to next update - 1 sec
-            await asyncio.sleep(self.lifetime - 1)
-            asyncio.ensure_future(self.update_register())
+            self.register_again()
+            return False
+        log.info(f'updated registration for {self.rd_resource}')
+        self.awake()
+        return True
 
-    async def run(self):
-        self.context = await Context.create_server_context(self, bind=(self.address, 0))
+    def register_again(self):
+        # at most one re-registration at a time, even if several updates fail
+        if self.registration is None or self.registration.done():
+            self.registration = asyncio.ensure_future(self.reregister())
+
+    async def reregister(self):
+        await self.start()
+        self.schedule_update()
+
+    async def start(self):
+        if self.context is None:
+            self.context = await Context.create_server_context(self, bind=(self.address, 0))
+        if self.bootstrap_server is not None and self.bootstrap_done is None:
+            await self.bootstrap()
 
         # send POST (registration)
-        request = Message(code=Code.POST, payload=','.join(
-            self.model.get_object_links()).encode(),
-            uri=f'coap://{self.server}:{self.server_port}'
+        request = Message(code=Code.POST, payload=self.model.object_links().encode(),
+            uri=f'coap://{hostportjoin(self.server, self.server_port)}'
         )
         request.opt.uri_host = self.server
         request.opt.uri_port = self.server_port
         request.opt.uri_path = ('rd',)
         request.opt.uri_query = (
             f'ep={self.endpoint}', f'b={self.binding_mode}', f'lt={self.lifetime}')
+        self.stats.count('register')
         response = await self.context.request(request).response
 
         # expect ACK
@@ -174,19 +599,83 @@ class Client(resource.Site):
         # we receive resource path ('rd', 'xyz...')
         self.rd_resource = response.opt.location_path[1]
         log.info(f'client registered at location {self.rd_resource}')
-        await asyncio.sleep(self.lifetime - 1)
-        asyncio.ensure_future(self.update_register())
+        self.awake()
+        self.data_sources.start()
+
+    def schedule_update(self):
+        # a single periodic update loop per client, replaced on re-registration
+        if self.update_task is not None:
+            self.update_task.cancel()
+        self.update_task = asyncio.ensure_future(self.keep_registered())
+
+    async def keep_registered(self):
+        while True:
+            # yield to next update - 1 sec
+            await asyncio.sleep(self.lifetime - 1)
+            if not await self.update_register():
+                return
+
+    async def run(self):
+        await self.start()
+        self.schedule_update()
+
+
+async def run_fleet(clients, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+
+    async def _start(client):
+        # limit the number of endpoints bootstrapping and registering at the same time
+        async with semaphore:
+            await client.start()
+
+    results = await asyncio.gather(*[_start(c) for c in clients], return_exceptions=True)
+    _running = list()
+    for client, result in zip(clients, results):
+        if isinstance(result, BaseException):
+            log.error(f'{client.endpoint}: {result}')
+        else:
+            _running.append(client)
+    log.info(
+        f'{len(_running)} of {len(clients)} endpoints registered in {time.monotonic() - started:.2f}s')
+    for client in _running:
+        client.schedule_update()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser('lwm2mclient')
     parser.add_argument('--address', type=str, default='::',
                         help='Address for client to bind and listen for incoming requests')
+    parser.add_argument('--binding', type=str, default='UQ', choices=('U', 'UQ'),
+                        help='Binding mode, "UQ" buffers notifications while the client sleeps')
+    parser.add_argument('--awake-time', type=int, default=93,
+                        help='Queue mode: seconds the client stays awake after a registration update')
+    parser.add_argument('--sleep-time', type=int, default=300,
+                        help='Queue mode: seconds between wake-ups to flush queued notifications')
+    parser.add_argument('--queue-size', type=int, default=32,
+                        help='Queue mode: maximum number of paths with queued notifications')
+    parser.add_argument('--server', type=str, default='localhost',
+                        help='LwM2M server to register with, if no bootstrap server is used')
+    parser.add_argument('--server-port', type=int, default=5683,
+                        help='Port of the LwM2M server')
+    parser.add_argument('--bootstrap', type=str, default=None,
+                        help='Bootstrap server as host[:port] to request the LwM2M server account from')
+    parser.add_argument('--endpoint', type=str, default=Client.endpoint,
+                        help='Endpoint client name, used as prefix in fleet mode')
+    parser.add_argument('--fleet', type=int, default=0,
+                        help='Fleet mode: number of endpoints to run, each with its own model')
+    parser.add_argument('--fleet-concurrency', type=int, default=10,
+                        help='Fleet mode: maximum number of endpoints bootstrapping at the same time')
     args = parser.parse_args()
 
-    client = Client(**vars(args))
     loop = asyncio.get_event_loop()
-    asyncio.ensure_future(client.run())
+    if args.fleet > 0:
+        clients = [Client(model=ClientModel(), **dict(vars(args), endpoint=f'{args.endpoint}-{i}'))
+                   for i in range(args.fleet)]
+        asyncio.ensure_future(run_fleet(clients, args.fleet_concurrency))
+    else:
+        client = Client(**vars(args))
+        asyncio.ensure_future(client.run())
     try:
         loop.run_forever()
     except KeyboardInterrupt:
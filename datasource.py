@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import math
+import os
+import time
+
+from encdec import TextDecoder
+
+log = logging.getLogger('datasource')
+
+
+class DataSource(object):
+    """Base class for a source feeding values of a single resource into the model.
+
+    Subclasses implement the ``values()`` async generator. A source is pulled at most
+    once per ``interval`` seconds, and at most ``maxsize`` samples are kept pending;
+    a full queue suspends the producer until the manager consumes it (backpressure).
+    """
+
+    # seconds between attempts to open a file, socket or pipe, doubled up to retry_max
+    retry_min = 1.0
+    retry_max = 60.0
+
+    def __init__(self, path, interval=1.0, maxsize=1):
+        self.path = tuple(str(p) for p in path)
+        if len(self.path) != 3:
+            raise AttributeError(f'data source path must address a resource: {self.path}')
+        self.interval = interval
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def values(self):
+        raise NotImplementedError
+
+    async def run(self):
+        _next = time.monotonic()
+        async for value in self.values():
+            await self.queue.put(value)
+            _next += self.interval
+            _delay = _next - time.monotonic()
+            if _delay > 0:
+                await asyncio.sleep(_delay)
+            else:
+                # consumer is behind, do not try to catch up with a burst
+                _next = time.monotonic()
+        log.info(f'data source for {"/".join(self.path)} exhausted')
+
+    def pending(self):
+        # drain everything queued so far, only the newest sample is relevant
+        value = None
+        while not self.queue.empty():
+            value = self.queue.get_nowait()
+        return value
+
+    def __repr__(self):
+        return f'{type(self).__name__}(/{"/".join(self.path)}, interval={self.interval})'
+
+
+class IteratorSource(DataSource):
+    def __init__(self, path, iterable, **kwargs):
+        super(IteratorSource, self).__init__(path, **kwargs)
+        self.iterable = iterable
+
+    async def values(self):
+        if hasattr(self.iterable, '__aiter__'):
+            async for value in self.iterable:
+                yield value
+        else:
+            for value in self.iterable:
+                yield value
+
+
+class FileTailSource(DataSource):
+    def __init__(self, path, filename, poll=0.5, **kwargs):
+        super(FileTailSource, self).__init__(path, **kwargs)
+        self.filename = filename
+        self.poll = poll
+
+    async def values(self):
+        _retry = self.retry_min
+        # only lines appended after start, a file created or rotated later is read from its start
+        _seek_end = True
+        while True:
+            try:
+                f = open(self.filename)
+            except OSError as e:
+                log.warning(f'{self}: unable to open: {e}, retrying in {_retry:.1f}s')
+                await asyncio.sleep(_retry)
+                _retry = min(_retry * 2, self.retry_max)
+                _seek_end = False
+                continue
+            _retry = self.retry_min
+            with f:
+                if _seek_end:
+                    f.seek(0, os.SEEK_END)
+                    _seek_end = False
+                _inode = os.fstat(f.fileno()).st_ino
+                while True:
+                    line = f.readline()
+                    if line:
+                        line = line.strip()
+                        if line:
+                            yield line
+                        continue
+                    try:
+                        _stat = os.stat(self.filename)
+                    except OSError:
+                        _stat = None
+                    if _stat is None or _stat.st_ino != _inode:
+                        log.info(f'{self}: file was removed or replaced, reopening')
+                        break
+                    if _stat.st_size < f.tell():
+                        log.info(f'{self}: file was truncated, reading from start')
+                        f.seek(0)
+                        continue
+                    await asyncio.sleep(self.poll)
+
+
+class StreamSource(DataSource):
+    async def open(self):
+        raise NotImplementedError
+
+    async def values(self):
+        _retry = self.retry_min
+        while True:
+            try:
+                reader = await self.open()
+            except OSError as e:
+                # e.g. connection refused or FIFO not created yet, retry with backoff
+                log.warning(f'{self}: unable to open: {e}, retrying in {_retry:.1f}s')
+                await asyncio.sleep(_retry)
+                _retry = min(_retry * 2, self.retry_max)
+                continue
+            _retry = self.retry_min
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    yield line.decode()
+            log.debug(f'{self}: end of stream, reopening')
+
+
+class SocketSource(StreamSource):
+    def __init__(self, path, host=None, port=None, unix_path=None, **kwargs):
+        super(SocketSource, self).__init__(path, **kwargs)
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.writer = None
+
+    async def open(self):
+        if self.writer is not None:
+            self.writer.close()
+        # keep a reference to the writer, the transport is closed once it is garbage collected
+        if self.unix_path is not None:
+            reader, self.writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return reader
+
+
+class PipeSource(StreamSource):
+    def __init__(self, path, fifo, **kwargs):
+        super(PipeSource, self).__init__(path, **kwargs)
+        self.fifo = fifo
+
+    async def open(self):
+        loop = asyncio.get_event_loop()
+        reader = asyncio.StreamReader()
+        fd = os.open(self.fifo, os.O_RDONLY | os.O_NONBLOCK)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, 'rb'))
+        return reader
+
+
+class WaveformSource(DataSource):
+    shapes = {
+        'sine': lambda phase: math.sin(2 * math.pi * phase),
+        'square': lambda phase: 1.0 if phase < 0.5 else -1.0,
+        'sawtooth': lambda phase: 2.0 * phase - 1.0,
+        'triangle': lambda phase: 1.0 - 4.0 * abs(phase - 0.5),
+    }
+
+    def __init__(self, path, shape='sine', period=60.0, amplitude=1.0, offset=0.0, **kwargs):
+        super(WaveformSource, self).__init__(path, **kwargs)
+        if shape not in self.shapes:
+            raise AttributeError(f'unknown waveform: {shape}. Must be one of ({",".join(self.shapes)})')
+        self.shape = self.shapes[shape]
+        self.period = period
+        self.amplitude = amplitude
+        self.offset = offset
+
+    async def values(self):
+        start = time.monotonic()
+        while True:
+            phase = ((time.monotonic() - start) % self.period) / self.period
+            yield self.offset + self.amplitude * self.shape(phase)
+
+
+class DataSourceManager(object):
+    def __init__(self, model, tick=1.0):
+        self.model = model
+        self.tick = tick
+        self.sources = []
+        self.notifiers = dict()
+        self.tasks = []
+
+    def add_source(self, source):
+        self.sources.append(source)
+        if self.tasks:
+            self.tasks.append(asyncio.ensure_future(source.run()))
+        return source
+
+    def has_source(self, path):
+        _path = tuple(str(p) for p in path)
+        return any(s.path[:len(_path)] == _path for s in self.sources)
+
+    def observe(self, path, notifier, cancel=False):
+        _path = tuple(str(p) for p in path)
+        if cancel:
+            self.notifiers.pop(_path, None)
+        else:
+            self.notifiers[_path] = notifier
+
+    def start(self):
+        if self.tasks:
+            return
+        log.info(f'starting data sources: {self.sources}')
+        self.tasks = [asyncio.ensure_future(s.run()) for s in self.sources]
+        self.tasks.append(asyncio.ensure_future(self.run()))
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def convert(self, path, value):
+        # values must match the resource type, e.g. a float waveform feeding an integer resource
+        _obj, _inst, _res = path
+        if isinstance(value, str):
+            return TextDecoder.decode(self.model, path, value.encode())[_obj][_inst][_res]
+        _type = self.model.definition[_obj]['resourcedefs'][_res]['type']
+        if _type in ('integer', 'time'):
+            return int(round(value))
+        elif _type == 'float':
+            return float(value)
+        elif _type == 'boolean':
+            return bool(value)
+        elif _type == 'string':
+            return str(value)
+        elif _type == 'opaque' and isinstance(value, (bytes, bytearray)):
+            return value.hex()
+        raise TypeError(f'unsupported value for type {_type}')
+
+    def collect(self):
+        result = dict()
+        for source in self.sources:
+            value = source.pending()
+            if value is None:
+                continue
+            if not self.model.is_path_valid(source.path[:2]):
+                # instance was deleted (or not yet created), e.g. by the server or bootstrap
+                log.debug(f'{source}: dropping value, instance does not exist')
+                continue
+            _obj, _inst, _res = source.path
+            try:
+                value = self.convert(source.path, value)
+            except (ValueError, TypeError, KeyError) as e:
+                log.warning(f'{source}: dropping invalid value "{value}": {e}')
+                continue
+            result.setdefault(_obj, dict()).setdefault(_inst, dict())[_res] = value
+        return result
+
+    def notify(self, changes):
+        _notified = set()
+        for obj in changes.keys():
+            for inst in changes[obj].keys():
+                for res in changes[obj][inst].keys():
+                    for path in ((obj,), (obj, inst), (obj, inst, res)):
+                        if path in self.notifiers and path not in _notified:
+                            _notified.add(path)
+                            self.notifiers[path]()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            changes = self.collect()
+            if changes:
+                # a single model write per tick for all sources
+                self.model.apply(changes)
+                self.notify(changes)
@@ -48,6 +48,8 @@ class TlvEncoder(object):
             msg = Message(code=Code.CONTENT, payload=_buf,
                           content_format=MediaType.TLV.value)
             return msg
+        elif not model.instances(obj):
+            return Message(code=Code.NOT_FOUND)
         else:
             # directly encode resources
             _inst = model.instances(obj)[0]
@@ -381,6 +383,14 @@ class PayloadEncoder(object):
         else:
             return Message(code=Code.BAD_REQUEST)
 
+    def discover(self, path):
+        if len(path) not in (1, 2, 3):
+            return Message(code=Code.BAD_REQUEST)
+        if not self.model.is_path_valid(path):
+            return Message(code=Code.NOT_FOUND)
+        return Message(code=Code.CONTENT, payload=self.model.discover_links(path).encode(),
+                       content_format=MediaType.LINK.value)
+
 
 class PayloadDecoder(object):
     def __init__(self, _model):
@@ -403,6 +413,32 @@ class PayloadDecoder(object):
         except DecoderException as e:
             return Message(code=Code.BAD_REQUEST, payload=e.message.encode()), None
 
+    def decode_instances(self, path, payload, content_format):
+        # decodes the payload of a Create into a list of (instance ID, resources),
+        # instance ID is None if it should be chosen by the client
+        _obj = path[0]
+        _inst = path[1] if len(path) > 1 else None
+        if len(payload) == 0:
+            return Message(code=Code.CREATED), [(_inst, dict())]
+        if content_format != MediaType.TLV.value:
+            return Message(code=Code.UNSUPPORTED_MEDIA_TYPE), None
+        try:
+            _id, _value, _type, _rest = TlvDecoder._decode(path, payload)
+            if _type >> 6 != TlvType.OBJECT_INSTANCE.value >> 6:
+                # resources only
+                _decoded = TlvDecoder.decode(self.model, (_obj, _inst), payload)
+                return Message(code=Code.CREATED), [(_inst, _decoded[_obj][_inst])]
+            result = list()
+            _payload = payload
+            while len(_payload) != 0:
+                _id, _value, _type, _payload = TlvDecoder._decode(path, _payload)
+                _decoded = TlvDecoder.decode(self.model, (_obj, str(_id)), _value) if len(_value) else {
+                    _obj: {str(_id): dict()}}
+                result.append((str(_id), _decoded[_obj][str(_id)]))
+            return Message(code=Code.CREATED), result
+        except (DecoderException, KeyError) as e:
+            return Message(code=Code.BAD_REQUEST, payload=str(e).encode()), None
+
 
 if __name__ == '__main__':
     model = ClientModel()
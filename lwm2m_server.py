@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+
+from aiocoap import error, resource
+from aiocoap.message import Message
+from aiocoap.numbers.codes import Code
+from aiocoap.protocol import Context
+
+from encdec import MediaType
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s [%(levelname)s] %(message)s')
+log = logging.getLogger('lwm2m-server')
+
+
+def percentile(values, p):
+    # nearest-rank percentile of sorted values
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p / 100.0 * len(values)) - 1)]
+
+
+class Registration(object):
+    def __init__(self, location, endpoint, remote, lifetime, binding, links):
+        self.location = location
+        self.endpoint = endpoint
+        self.remote = remote
+        self.lifetime = lifetime
+        self.binding = binding
+        self.links = links
+        self.updated = time.monotonic()
+
+    def expired(self):
+        return time.monotonic() - self.updated > self.lifetime
+
+    @staticmethod
+    def parse_links(payload):
+        _links = [tuple(l.split(';')[0].strip('<>/').split('/')) for l in payload.decode().split(',') if l]
+        # the security object is never a valid target, even if a client announces it
+        return [l for l in _links if l[0] != '0']
+
+
+class RegistrationHandler(resource.Resource):
+    def __init__(self, server):
+        super(RegistrationHandler, self).__init__()
+        self.server = server
+
+    async def render(self, req):
+        path, request = req
+        m = getattr(self, 'render_%s' % str(request.code).lower(), None)
+        if not m:
+            raise error.UnallowedMethod()
+        return await m(path, request)
+
+    async def render_post(self, path, request):
+        _query = dict(q.partition('=')[::2] for q in request.opt.uri_query)
+        if len(path) == 0:
+            return self.server.register(request, _query)
+        elif len(path) == 1:
+            return self.server.update(path[0], request, _query)
+        return Message(code=Code.BAD_REQUEST)
+
+    async def render_delete(self, path, request):
+        if len(path) != 1:
+            return Message(code=Code.BAD_REQUEST)
+        return self.server.deregister(path[0])
+
+
+class LwM2MServer(resource.Site):
+    """Minimal stand-in LwM2M server, accepting registrations, updates and de-registrations."""
+
+    context = None
+
+    def __init__(self, **kwargs):
+        super(LwM2MServer, self).__init__()
+        self.address = kwargs['address'] if 'address' in kwargs else '::'
+        self.port = kwargs['port'] if 'port' in kwargs else 5683
+        self.registrations = OrderedDict()
+        self.on_registered = list()
+        self.on_removed = list()
+        self.counter = 0
+        self.registration_handler = RegistrationHandler(self)
+
+    async def render(self, request):
+        # route /rd and /rd/{location} explicitly, a path capable sub-site does not
+        # receive the Register on /rd itself on all aiocoap versions
+        uri_path = request.opt.uri_path
+        if len(uri_path) > 0 and uri_path[0] == 'rd':
+            return await self.registration_handler.render((tuple(uri_path[1:]), request,))
+        return await super(LwM2MServer, self).render(request)
+
+    def register(self, request, query):
+        if not query.get('ep'):
+            return Message(code=Code.BAD_REQUEST)
+        # a new registration of an endpoint replaces the previous one
+        for reg in [r for r in self.registrations.values() if r.endpoint == query['ep']]:
+            self.remove(reg)
+        self.counter += 1
+        reg = Registration(f'{self.counter:x}', query['ep'], request.remote.hostinfo,
+                           int(query.get('lt', 86400)), query.get('b', 'U'),
+                           Registration.parse_links(request.payload))
+        self.registrations[reg.location] = reg
+        log.info(f'registered {reg.endpoint} at /rd/{reg.location} ({len(self.registrations)} registrations)')
+        for callback in self.on_registered:
+            callback(reg)
+        return Message(code=Code.CREATED, location_path=('rd', reg.location))
+
+    def update(self, location, request, query):
+        reg = self.registrations.get(location)
+        if reg is None:
+            return Message(code=Code.NOT_FOUND)
+        reg.updated = time.monotonic()
+        reg.remote = request.remote.hostinfo
+        if 'lt' in query:
+            reg.lifetime = int(query['lt'])
+        if request.payload:
+            reg.links = Registration.parse_links(request.payload)
+        log.debug(f'updated registration of {reg.endpoint}')
+        return Message(code=Code.CHANGED)
+
+    def deregister(self, location):
+        reg = self.registrations.get(location)
+        if reg is None:
+            return Message(code=Code.NOT_FOUND)
+        self.remove(reg)
+        log.info(f'de-registered {reg.endpoint}')
+        return Message(code=Code.DELETED)
+
+    def active(self):
+        for reg in [r for r in self.registrations.values() if r.expired()]:
+            log.info(f'registration of {reg.endpoint} expired')
+            self.remove(reg)
+        return list(self.registrations.values())
+
+    def remove(self, reg):
+        del self.registrations[reg.location]
+        for callback in self.on_removed:
+            callback(reg)
+
+    async def run(self):
+        self.context = await Context.create_server_context(self, bind=(self.address, self.port))
+        log.info(f'LwM2M server listening on port {self.port}')
+
+
+class LoadStats(object):
+    """Latencies, errors and drops per operation; latencies are kept for the current report interval only."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.interval_started = self.started
+        self.latencies = OrderedDict()
+        self.errors = OrderedDict()
+        self.dropped = OrderedDict()
+        # cumulative (received, errors, dropped) per operation since start
+        self.totals = OrderedDict()
+
+    def count(self, kind, index):
+        _total = self.totals.setdefault(kind, [0, 0, 0])
+        _total[index] += 1
+
+    def record(self, kind, latency=None):
+        # latency is None for client-initiated messages like notifications
+        self.latencies.setdefault(kind, list()).append(latency)
+        self.count(kind, 0)
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+        self.count(kind, 1)
+
+    def drop(self, kind):
+        self.dropped[kind] = self.dropped.get(kind, 0) + 1
+        self.count(kind, 2)
+
+    def report(self):
+        # statistics of the interval since the last report, which are reset afterwards
+        _now = time.monotonic()
+        _elapsed = max(_now - self.interval_started, 0.001)
+        _lines = [f'load report for the last {_elapsed:.1f}s ({_now - self.started:.1f}s since start):']
+        for kind in self.totals:
+            _received = len(self.latencies.get(kind, list()))
+            _lat = sorted(l for l in self.latencies.get(kind, list()) if l is not None)
+            _err = self.errors.get(kind, 0)
+            _total = _received + _err
+            _received_total, _err_total, _dropped_total = self.totals[kind]
+            _lines.append(
+                f'  {kind:<8} n={_total:<7} {_received / _elapsed:8.1f}/s '
+                f'errors={100.0 * _err / max(_total, 1):5.1f}% dropped={self.dropped.get(kind, 0):<5} '
+                f'p50={percentile(_lat, 50) * 1000:.1f}ms p95={percentile(_lat, 95) * 1000:.1f}ms '
+                f'p99={percentile(_lat, 99) * 1000:.1f}ms max={(_lat[-1] if _lat else 0) * 1000:.1f}ms '
+                f'total: n={_received_total + _err_total} errors={_err_total} dropped={_dropped_total}')
+        self.interval_started = _now
+        self.latencies = OrderedDict()
+        self.errors = OrderedDict()
+        self.dropped = OrderedDict()
+        return '\n'.join(_lines)
+
+
+class LoadGenerator(object):
+    """Drives read, write and execute requests at fixed rates against registered endpoints
+    and establishes observations on every new registration."""
+
+    def __init__(self, server, read=0, write=0, execute=0, observe_path=None, write_path='3/0/15',
+                 write_value='Europe/Berlin', execute_path='3/0/12', concurrency=100, timeout=10, **kwargs):
+        self.server = server
+        self.rates = OrderedDict(read=read, write=write, execute=execute)
+        self.observe_paths = observe_path or list()
+        self.write_path = write_path
+        self.write_value = write_value
+        self.execute_path = execute_path
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stats = LoadStats()
+        # pending observations per registration location
+        self.observations = dict()
+        server.on_registered.append(self.observe)
+        server.on_removed.append(self.cancel)
+
+    def request(self, kind, reg):
+        if kind == 'read':
+            # read on a random instance announced by the client
+            _links = [l for l in reg.links if len(l) > 1] or [('3', '0')]
+            return Message(code=Code.GET, uri=f'coap://{reg.remote}/{"/".join(random.choice(_links))}')
+        elif kind == 'write':
+            return Message(code=Code.PUT, uri=f'coap://{reg.remote}/{self.write_path}',
+                           payload=self.write_value.encode(), content_format=MediaType.TEXT.value)
+        elif kind == 'execute':
+            return Message(code=Code.POST, uri=f'coap://{reg.remote}/{self.execute_path}')
+        raise AttributeError(f'unknown operation: {kind}')
+
+    async def operation(self, kind, reg):
+        if self.semaphore.locked():
+            # too many outstanding requests, do not queue up an unbounded backlog
+            self.stats.drop(kind)
+            return
+        async with self.semaphore:
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.server.context.request(self.request(kind, reg)).response, self.timeout)
+            except (asyncio.TimeoutError, error.Error, OSError) as e:
+                log.debug(f'{kind} on {reg.endpoint} failed: {e!r}')
+                self.stats.error(kind)
+                return
+            if response.code.is_successful():
+                self.stats.record(kind, time.monotonic() - started)
+            else:
+                log.debug(f'{kind} on {reg.endpoint} failed: {response.code}')
+                self.stats.error(kind)
+
+    async def drive(self, kind, rate):
+        _next = time.monotonic()
+        while True:
+            _next += 1.0 / rate
+            await asyncio.sleep(max(_next - time.monotonic(), 0))
+            registrations = self.server.active()
+            if registrations:
+                asyncio.ensure_future(self.operation(kind, random.choice(registrations)))
+
+    def observe(self, reg):
+        for path in self.observe_paths:
+            request = Message(code=Code.GET, uri=f'coap://{reg.remote}/{path}', observe=0)
+            started = time.monotonic()
+            pr = self.server.context.request(request)
+            pr.observation.register_callback(lambda response: self.stats.record('notify'))
+            pr.observation.register_errback(lambda e, pr=pr: self.notify_failed(pr))
+            self.observations.setdefault(reg.location, list()).append(pr)
+            asyncio.ensure_future(self.observed(reg, pr, started))
+
+    def notify_failed(self, pr):
+        # the observation ends with an error; a failed observe request is counted as observe error only
+        if pr.response.done() and not pr.response.cancelled() and pr.response.exception() is None \
+                and pr.response.result().code.is_successful():
+            self.stats.error('notify')
+
+    def cancel(self, reg):
+        # registration replaced, expired or de-registered: its observations are stale
+        for pr in self.observations.pop(reg.location, list()):
+            # an observation ended by an error is already cancelled
+            if not pr.observation.cancelled:
+                pr.observation.cancel()
+
+    async def observed(self, reg, pr, started):
+        try:
+            response = await asyncio.wait_for(pr.response, self.timeout)
+        except (asyncio.TimeoutError, error.Error, OSError) as e:
+            log.debug(f'observe on {reg.endpoint} failed: {e!r}')
+            self.stats.error('observe')
+            return
+        if response.code.is_successful():
+            self.stats.record('observe', time.monotonic() - started)
+        else:
+            self.stats.error('observe')
+
+    async def run(self, duration=0, report_interval=10):
+        tasks = [asyncio.ensure_future(self.drive(kind, rate)) for kind, rate in self.rates.items() if rate > 0]
+        _until = time.monotonic() + duration if duration > 0 else None
+        while _until is None or time.monotonic() < _until:
+            _remaining = _until - time.monotonic() if _until is not None else report_interval
+            await asyncio.sleep(max(min(report_interval, _remaining), 0))
+            log.info(self.stats.report())
+        for task in tasks:
+            task.cancel()
+        return self.stats
+
+
+async def main(args):
+    server = LwM2MServer(**vars(args))
+    await server.run()
+    generator = LoadGenerator(server, **vars(args))
+    await generator.run(args.duration, args.report_interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('lwm2m-server')
+    parser.add_argument('--address', type=str, default='::',
+                        help='Address for server to bind and listen for registrations')
+    parser.add_argument('--port', type=int, default=5683,
+                        help='Port for server to listen for registrations')
+    parser.add_argument('--read', type=float, default=0,
+                        help='Reads per second, each on a random registered endpoint')
+    parser.add_argument('--write', type=float, default=0,
+                        help='Writes per second, each on a random registered endpoint')
+    parser.add_argument('--execute', type=float, default=0,
+                        help='Executes per second, each on a random registered endpoint')
+    parser.add_argument('--observe-path', type=str, action='append',
+                        help='Path to observe on every registered endpoint, may be repeated')
+    parser.add_argument('--write-path', type=str, default='3/0/15',
+                        help='Resource written by the write workload (TEXT)')
+    parser.add_argument('--write-value', type=str, default='Europe/Berlin',
+                        help='Value written by the write workload')
+    parser.add_argument('--execute-path', type=str, default='3/0/12',
+                        help='Resource executed by the execute workload')
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help='Maximum number of outstanding requests, further requests are dropped')
+    parser.add_argument('--timeout', type=float, default=10,
+                        help='Seconds after which a request counts as failed')
+    parser.add_argument('--duration', type=float, default=0,
+                        help='Seconds to run the workload, 0 runs forever')
+    parser.add_argument('--report-interval', type=float, default=10,
+                        help='Seconds between load reports')
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(main(args))
+    except KeyboardInterrupt:
+        pass
+    loop.close()
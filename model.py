@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import logging
+from bisect import insort
 from json import load
 
 logging.basicConfig(level=logging.DEBUG,
@@ -14,17 +15,23 @@ class ClientModel(object):
             self.definition = load(f)
         with open(data_file) as f:
             self.data = load(f)
+        # sorted instance IDs per object, maintained on create/delete of instances
+        self.index = {int(obj): sorted([int(i) for i in self.data[obj].keys()]) for obj in self.data.keys()}
+        self._object_links = None
+        # notification attributes (pmin, pmax, ...) per object/instance/resource path
+        self.attributes = dict()
+        # link-format discover payloads per path, invalidated per object
+        self._discover_links = dict()
         # simple validation: check if all data objects are in the definition
         for obj in self.objects():
             if not self.has_definition(obj):
                 exit(f'{data_file} contains undefined object with ID {obj}. Aborting.')
 
     def objects(self):
-        return [x for x in sorted([int(i) for i in self.data.keys()])]
+        return sorted(self.index.keys())
 
     def instances(self, obj):
-        _insts = self.data[str(obj)]
-        return [x for x in sorted([int(i) for i in _insts.keys()])]
+        return list(self.index[int(obj)])
 
     def resources(self, obj, inst=0):
         return [x for x in sorted([int(i) for i in self.data[str(obj)][str(inst)].keys()])]
@@ -54,9 +61,133 @@ class ClientModel(object):
 
     def get_object_links(self):
         for obj in self.objects():
-            for inst in self.instances(obj):
+            if obj == 0:
+                # security object must not be announced to the server
+                continue
+            if not self.index[obj]:
+                yield f'</{obj}>'
+            for inst in self.index[obj]:
                 yield f'</{obj}/{inst}>'
 
+    def object_links(self):
+        # registration payload, rebuilt only after instances were created or deleted
+        if self._object_links is None:
+            self._object_links = ','.join(self.get_object_links())
+        return self._object_links
+
+    def create_instance(self, obj, inst=None, resources=None):
+        if not self.has_definition(obj):
+            raise AttributeError(f'undefined object with ID {obj}')
+        _insts = self.index.get(int(obj), [])
+        if _insts and not self.is_object_multi_instance(obj):
+            raise AttributeError(f'object {obj} is single-instance and has already an instance')
+        if inst is None:
+            # lowest free instance ID
+            inst = next(i for i in range(len(_insts) + 1) if i not in _insts)
+        elif int(inst) in _insts:
+            raise AttributeError(f'instance /{obj}/{inst} already exists')
+        self.data.setdefault(str(obj), dict())[str(inst)] = dict(resources) if resources else dict()
+        # index entry of a new object only once its first instance exists
+        insort(self.index.setdefault(int(obj), _insts), int(inst))
+        self._object_links = None
+        self.invalidate_links(obj)
+        log.debug(f'created instance /{obj}/{inst}')
+        return str(inst)
+
+    def delete_instance(self, obj, inst):
+        del self.data[str(obj)][str(inst)]
+        self.index[int(obj)].remove(int(inst))
+        self._object_links = None
+        for path in [p for p in self.attributes.keys() if p[:2] == (str(obj), str(inst))]:
+            del self.attributes[path]
+        self.invalidate_links(obj)
+        log.debug(f'deleted instance /{obj}/{inst}')
+
+    def delete_object(self, obj):
+        # objects without instances only, e.g. a new object after a failed Create
+        del self.data[str(obj)]
+        del self.index[int(obj)]
+        self._object_links = None
+        self.invalidate_links(obj)
+        log.debug(f'deleted object /{obj}')
+
+    def check_instance(self, obj, resources):
+        # a Create must provide all mandatory resources with a value, executable ones have none
+        _defs = self.definition[str(obj)]['resourcedefs']
+        _resources = [str(r) for r in resources.keys()]
+        for res in _resources:
+            if res not in _defs:
+                raise AttributeError(f'undefined resource {res} of object {obj}')
+            if self.is_resource_executable(str(obj), None, res):
+                raise AttributeError(f'resource {res} of object {obj} is executable and cannot be written')
+        _missing = [r for r, d in _defs.items()
+                    if d['mandatory'] and not self.is_resource_executable(str(obj), None, r) and r not in _resources]
+        if _missing:
+            raise AttributeError(f'missing mandatory resources of object {obj}: {",".join(_missing)}')
+
+    def invalidate_links(self, obj):
+        for path in [p for p in self._discover_links.keys() if p[0] == str(obj)]:
+            del self._discover_links[path]
+
+    def get_attributes(self, path):
+        return self.attributes.get(tuple(str(p) for p in path), dict())
+
+    def set_attributes(self, path, attributes):
+        # attributes with value None are removed
+        _path = tuple(str(p) for p in path)
+        _attrs = dict(self.attributes.get(_path, dict()))
+        for name, value in attributes.items():
+            if value is None:
+                _attrs.pop(name, None)
+            else:
+                _attrs[name] = value
+        if _attrs:
+            self.attributes[_path] = _attrs
+        else:
+            self.attributes.pop(_path, None)
+        self.invalidate_links(_path[0])
+
+    def _link(self, path, attributes):
+        _link = f'</{"/".join(path)}>'
+        for name, value in attributes.items():
+            _link += f';{name}={value}'
+        return _link
+
+    def _resource_link(self, obj, inst, res, attributes):
+        _path = (str(obj), str(inst), str(res))
+        _attrs = dict()
+        if self.is_resource_multi_instance(obj, inst, res):
+            _attrs['dim'] = len(self.resource(obj, inst, res))
+        _attrs.update(attributes)
+        return self._link(_path, _attrs)
+
+    def discover_links(self, path):
+        _path = tuple(str(p) for p in path)
+        if _path in self._discover_links:
+            return self._discover_links[_path]
+        _links = list()
+        if len(_path) == 3:
+            # resource level includes attributes inherited from object and instance
+            _attrs = dict(self.get_attributes(_path[:1]))
+            _attrs.update(self.get_attributes(_path[:2]))
+            _attrs.update(self.get_attributes(_path))
+            _links.append(self._resource_link(*_path, _attrs))
+        else:
+            _links.append(self._link(_path, self.get_attributes(_path)))
+            _insts = self.instances(_path[0]) if len(_path) == 1 else [_path[1]]
+            for inst in _insts:
+                if len(_path) == 1:
+                    _links.append(self._link((_path[0], str(inst)), self.get_attributes((_path[0], inst))))
+                for res in self.resources(_path[0], inst):
+                    _links.append(self._resource_link(
+                        _path[0], inst, res, self.get_attributes((_path[0], inst, res))))
+        self._discover_links[_path] = ','.join(_links)
+        return self._discover_links[_path]
+
+    def is_bootstrap_account(self, inst):
+        # security object (/0) instance of the bootstrap server
+        return self.is_path_valid((0, inst)) and 1 in self.resources(0, inst) and self.resource(0, inst, 1) is True
+
     def is_path_valid(self, path):
         if len(path) == 3:
             _obj = int(path[0])
@@ -82,7 +213,11 @@ class ClientModel(object):
         return False if _ops == 'NONE' else 'E' in _ops
 
     def set_resource(self, obj, inst, res, content):
-        self.data[str(obj)][str(inst)][str(res)] = content
+        _inst = self.data[str(obj)][str(inst)]
+        if str(res) not in _inst or (isinstance(content, dict) and len(content) != len(_inst[str(res)])):
+            # new resource or changed dimension of a multiple resource
+            self.invalidate_links(obj)
+        _inst[str(res)] = content
 
     def apply(self, data):
         for obj in data.keys():
@@ -95,7 +230,7 @@ class ClientModel(object):
 
 if __name__ == '__main__':
     model = ClientModel()
-    log.debug(f'object links: {",".join(model.get_object_links())}')
+    log.debug(f'object links: {model.object_links()}')
     log.debug(f'objects: {model.objects()}')
     for obj in model.objects():
         log.debug(
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import logging
+import time
+from collections import OrderedDict
+
+log = logging.getLogger('queuemode')
+
+
+class NotificationQueue(object):
+    """Bounded buffer for notifications held back while the client sleeps in queue mode.
+
+    Only the latest notification per path is kept; when the buffer is full, the oldest
+    pending path is dropped.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.pending = OrderedDict()
+        self.dropped = 0
+
+    def put(self, path, notifier):
+        _path = tuple(str(p) for p in path)
+        if _path in self.pending:
+            # newer notification replaces the older one
+            del self.pending[_path]
+        elif len(self.pending) >= self.maxsize:
+            _dropped, _ = self.pending.popitem(last=False)
+            self.dropped += 1
+            log.warning(f'notification queue full, dropped notification for {"/".join(_dropped)}')
+        self.pending[_path] = notifier
+
+    def discard(self, path):
+        self.pending.pop(tuple(str(p) for p in path), None)
+
+    def flush(self):
+        _notifiers = list(self.pending.values())
+        self.pending.clear()
+        for notifier in _notifiers:
+            notifier()
+        return len(_notifiers)
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class PacketStats(object):
+    """Counts client-initiated packets (registrations, updates, notifications) per kind."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = time.monotonic()
+        self.counts = OrderedDict()
+
+    def count(self, kind, n=1):
+        self.counts[kind] = self.counts.get(kind, 0) + n
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def per_hour(self):
+        _elapsed = max(time.monotonic() - self.started, 1.0)
+        return self.total() * 3600.0 / _elapsed
+
+    def __str__(self):
+        _counts = ' '.join(f'{k}={v}' for k, v in self.counts.items())
+        return f'mode={self.mode} packets={self.total()} ({self.per_hour():.1f}/h) {_counts}'
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import time
+
+import pytest
+from aiocoap.message import Message
+from aiocoap.numbers.codes import Code
+
+from datasource import DataSourceManager, IteratorSource
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Remote(object):
+    def __init__(self, hostinfo):
+        self.hostinfo = hostinfo
+
+
+class Observation(object):
+    """Records the notifications aiocoap would send for a server observation."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.notifications = list()
+        self.cancel = None
+
+    def accept(self, cancellation_callback):
+        self.cancel = cancellation_callback
+
+    def trigger(self, response=None):
+        self.notifications.append((time.monotonic() - self.started, response.code))
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    # model files are loaded relative to the working directory
+    monkeypatch.chdir(HERE)
+    from model import ClientModel
+    return ClientModel()
+
+
+@pytest.fixture
+def handler(model):
+    from client import RequestHandler
+    from encdec import PayloadDecoder, PayloadEncoder
+    data_sources = DataSourceManager(model)
+    for path in (('3', '0', '9'), ('6', '0', '0')):
+        data_sources.add_source(IteratorSource(path, []))
+    return RequestHandler(model, PayloadEncoder(model), PayloadDecoder(model), data_sources)
+
+
+async def observed(handler, path, remote='[::1]:5683'):
+    request = Message(code=Code.GET, observe=0)
+    request.remote = Remote(remote)
+    observation = Observation()
+    await handler.add_observation((path, request), observation)
+    assert handler.handle_observe(path, request).code == Code.CONTENT
+    return observation
+
+
+def cancel_observation(handler, path, remote='[::1]:5683'):
+    request = Message(code=Code.GET, observe=1)
+    request.remote = Remote(remote)
+    return handler.handle_observe(path, request)
+
+
+def test_discover_links(model):
+    assert model.discover_links(('3', '0', '7')) == '</3/0/7>;dim=2'
+    model.set_attributes(('3',), dict(pmax=60))
+    model.set_attributes(('3', '0', '7'), dict(pmin=10, pmax=30))
+    # resource attributes take precedence over inherited ones
+    assert model.discover_links(('3', '0', '7')) == '</3/0/7>;dim=2;pmax=30;pmin=10'
+    assert model.discover_links(('5',)).split(',')[:2] == ['</5>', '</5/0>']
+
+
+def test_discover_links_cached_and_invalidated(model):
+    _links = model.discover_links(('3',))
+    _other = model.discover_links(('1', '0'))
+    assert model.discover_links(('3',)) is _links
+    # attributes
+    model.set_attributes(('3', '0', '9'), dict(gt=50.0))
+    assert '</3/0/9>;gt=50.0' in model.discover_links(('3',))
+    model.set_attributes(('3', '0', '9'), dict(gt=None))
+    assert model.discover_links(('3',)) == _links
+    # dimension of a multiple resource
+    model.set_resource(3, 0, 7, {'0': 3300, '5': 3300, '6': 3300})
+    assert '</3/0/7>;dim=3' in model.discover_links(('3',))
+    # a value change alone keeps the cache
+    _links = model.discover_links(('3',))
+    model.set_resource(3, 0, 9, 42)
+    assert model.discover_links(('3',)) is _links
+    # other objects are not affected
+    assert model.discover_links(('1', '0')) is _other
+    # instances created and deleted
+    model.create_instance(1, 1, {'0': 2, '1': 300, '6': False, '7': 'U'})
+    assert '</1/1>' in model.discover_links(('1',))
+    model.delete_instance(1, 1)
+    assert '</1/1>' not in model.discover_links(('1',))
+
+
+@pytest.mark.parametrize('query, code', [
+    (('pmin=10', 'pmax=60'), Code.CHANGED),
+    (('foo=1',), Code.BAD_REQUEST),
+    (('pmin=soon',), Code.BAD_REQUEST),
+])
+def test_write_attributes(handler, model, query, code):
+    assert handler.handle_write_attributes(('3', '0', '9'), query).code == code
+    if code == Code.CHANGED:
+        assert model.get_attributes(('3', '0', '9')) == dict(pmin=10, pmax=60)
+        # empty value removes an attribute
+        handler.handle_write_attributes(('3', '0', '9'), ('pmin=',))
+        assert model.get_attributes(('3', '0', '9')) == dict(pmax=60)
+    else:
+        assert model.get_attributes(('3', '0', '9')) == dict()
+    assert handler.handle_write_attributes(('3', '1'), ('pmin=10',)).code == Code.NOT_FOUND
+
+
+def test_pmin_merges_and_pmax_repeats_notifications(handler, model):
+    model.set_attributes(('3',), dict(pmax=0.5))
+    model.set_attributes(('3', '0', '9'), dict(pmin=0.2))
+
+    async def _run():
+        observation = await observed(handler, ('3', '0', '9'))
+        notifier = handler.data_sources.notifiers[('3', '0', '9')]
+        for _ in range(3):
+            notifier()
+        await asyncio.sleep(0.8)
+        return observation
+
+    observation = run(_run())
+    # three changes within pmin sent once at pmin, then the current value after pmax
+    assert [code for _, code in observation.notifications] == [Code.CONTENT, Code.CONTENT]
+    assert [at for at, _ in observation.notifications] == pytest.approx([0.2, 0.7], abs=0.05)
+
+
+def test_last_observer_gone_tears_down_notifications(handler, model):
+    model.set_attributes(('3', '0', '9'), dict(pmin=0.1, pmax=0.2))
+
+    async def _run():
+        first = await observed(handler, ('3', '0', '9'))
+        second = await observed(handler, ('3', '0', '9'), remote='[::2]:5683')
+        handler.data_sources.notifiers[('3', '0', '9')]()
+        first.cancel()
+        # one observer is left
+        assert ('3', '0', '9') in handler.periodic and ('3', '0', '9') in handler.deferred
+        second.cancel()
+        assert handler.observers == dict() and handler.periodic == dict()
+        assert handler.deferred == dict() and handler.notified == dict()
+        assert handler.data_sources.notifiers == dict()
+        await asyncio.sleep(0.3)
+        return first, second
+
+    first, second = run(_run())
+    assert first.notifications == [] and second.notifications == []
+
+
+def test_cancel_observation(handler, model):
+    model.set_attributes(('3', '0', '9'), dict(pmax=0.1))
+
+    async def _run():
+        observation = await observed(handler, ('3', '0', '9'))
+        # another server does not cancel the observation
+        assert cancel_observation(handler, ('3', '0', '9'), remote='[::2]:5683').code == Code.CONTENT
+        assert ('3', '0', '9') in handler.periodic
+        assert cancel_observation(handler, ('3', '0', '9')).code == Code.CONTENT
+        assert handler.periodic == dict() and handler.data_sources.notifiers == dict()
+        await asyncio.sleep(0.2)
+        return observation
+
+    assert run(_run()).notifications == []
+
+
+def test_observations_end_when_instance_is_deleted(handler, model):
+    model.set_attributes(('6',), dict(pmax=0.1))
+
+    async def _run():
+        observation = await observed(handler, ('6', '0', '0'))
+        assert handler.handle_delete(('6', '0')).code == Code.DELETED
+        assert handler.periodic == dict() and handler.notified == dict()
+        await asyncio.sleep(0.2)
+        return observation
+
+    assert [code for _, code in run(_run()).notifications] == [Code.NOT_FOUND]
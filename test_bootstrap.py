@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import socket
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as s:
+        s.bind(('::1', 0))
+        return s.getsockname()[1]
+
+
+async def bootstrap_and_register(client, bootstrap_server, lwm2m_server):
+    await bootstrap_server.run()
+    await lwm2m_server.run()
+    try:
+        await asyncio.wait_for(client.start(), 10)
+        # registration update on /rd/{location}
+        return await asyncio.wait_for(client.send_update(), 10)
+    finally:
+        client.data_sources.stop()
+        if client.sleep_handle is not None:
+            client.sleep_handle.cancel()
+        for context in (client.context, bootstrap_server.context, lwm2m_server.context):
+            if context is not None:
+                await context.shutdown()
+
+
+def test_bootstrap(monkeypatch):
+    # model files are loaded relative to the working directory
+    monkeypatch.chdir(HERE)
+    from bootstrap_server import BootstrapServer
+    from client import Client
+    from lwm2m_server import LwM2MServer
+    from model import ClientModel
+
+    bs_port, server_port = free_port(), free_port()
+    server_uri = f'coap://[::1]:{server_port}'
+    bootstrap_server = BootstrapServer(server_uri=server_uri, lifetime=300, binding='U',
+                                       address='::1', port=bs_port)
+    lwm2m_server = LwM2MServer(address='::1', port=server_port)
+    payloads = list()
+    _register = lwm2m_server.register
+
+    def register(request, query):
+        payloads.append(request.payload.decode())
+        return _register(request, query)
+
+    lwm2m_server.register = register
+    model = ClientModel()
+    client = Client(model=model, address='::1', endpoint='bootstrap-test', bootstrap=f'[::1]:{bs_port}')
+
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        update = loop.run_until_complete(bootstrap_and_register(client, bootstrap_server, lwm2m_server))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+    assert bootstrap_server.provisioned == 1 and bootstrap_server.failed == 0
+
+    # security object: bootstrap account and LwM2M server account
+    assert model.instances(0) == [0, 1]
+    assert model.is_bootstrap_account(0)
+    assert not model.is_bootstrap_account(1)
+    assert model.resource(0, 1, 0) == server_uri
+    assert model.resource(0, 1, 10) == BootstrapServer.ssid
+    # server object
+    assert model.instances(1) == [0]
+    assert model.resource(1, 0, 0) == BootstrapServer.ssid
+    assert model.resource(1, 0, 1) == 300
+    assert model.resource(1, 0, 7) == 'U'
+
+    # server account applied to the client
+    assert client.server == '::1'
+    assert client.server_port == server_port
+    assert client.lifetime == 300
+    assert client.binding_mode == 'U'
+
+    # registration with the provisioned server
+    assert len(payloads) == 1
+    assert '</0/' not in payloads[0]
+    assert '</1/0>' in payloads[0] and '</3/0>' in payloads[0]
+    reg, = lwm2m_server.registrations.values()
+    assert reg.endpoint == 'bootstrap-test'
+    assert reg.lifetime == 300
+    assert reg.binding == 'U'
+    assert client.rd_resource == reg.location
+    assert update.code.is_successful()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import os
+
+import pytest
+from aiocoap.message import Message
+from aiocoap.numbers.codes import Code
+
+from bootstrap_server import tlv_instance
+from encdec import MediaType, TlvEncoder, TlvType
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVER = {0: 2, 1: 300, 6: False, 7: 'U'}
+
+
+class Site(object):
+    def __init__(self):
+        self.created = list()
+        self.deleted = list()
+
+    def instances_changed(self, created=(), deleted=()):
+        self.created.extend(created)
+        self.deleted.extend(deleted)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    # model files are loaded relative to the working directory
+    monkeypatch.chdir(HERE)
+    from model import ClientModel
+    return ClientModel()
+
+
+@pytest.fixture
+def handler(model):
+    from client import RequestHandler
+    from encdec import PayloadDecoder, PayloadEncoder
+    return RequestHandler(model, PayloadEncoder(model), PayloadDecoder(model), site=Site())
+
+
+def tlv_instances(*instances):
+    return b''.join(TlvEncoder._pack(TlvType.OBJECT_INSTANCE, inst, tlv_instance(resources))
+                    for inst, resources in instances)
+
+
+def create(handler, path, payload=b''):
+    request = Message(code=Code.POST, payload=payload)
+    if payload:
+        request.opt.content_format = MediaType.TLV.value
+    return handler.handle_create(path, request)
+
+
+def test_instance_index_on_create_and_delete(model):
+    assert model.instances(1) == [0]
+    assert model.create_instance(1) == '1'
+    assert model.create_instance(1, 3) == '3'
+    # lowest free instance ID
+    assert model.create_instance(1) == '2'
+    assert model.instances(1) == [0, 1, 2, 3]
+    model.delete_instance(1, 0)
+    assert model.instances(1) == [1, 2, 3]
+    assert not model.is_path_valid((1, 0))
+    assert model.create_instance(1) == '0'
+    assert model.instances(1) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('obj, inst, error', [
+    (1, 0, 'already exists'),
+    (3, None, 'single-instance'),
+    (42, None, 'undefined object'),
+])
+def test_create_instance_errors(model, obj, inst, error):
+    _links = model.object_links()
+    with pytest.raises(AttributeError, match=error):
+        model.create_instance(obj, inst)
+    assert model.object_links() == _links
+    assert 42 not in model.index
+
+
+def test_object_links_cached_and_rebuilt(model):
+    _links = model.object_links()
+    assert _links == '</1/0>,</3/0>,</5/0>,</6/0>'
+    assert model.object_links() is _links
+    model.create_instance(2, 0, {'0': 1, '1': 0, '3': 1})
+    assert model.object_links() == '</1/0>,</2/0>,</3/0>,</5/0>,</6/0>'
+    model.delete_instance(2, 0)
+    # object without instances is still announced
+    assert model.object_links() == '</1/0>,</2>,</3/0>,</5/0>,</6/0>'
+    model.delete_object(2)
+    assert model.object_links() == _links
+
+
+def test_security_object_never_announced(model):
+    model.create_instance(0, 0, {'0': 'coap://localhost:5783', '1': True, '2': 3})
+    assert '</0' not in model.object_links()
+
+
+def test_check_instance(model):
+    model.check_instance(1, SERVER)
+    with pytest.raises(AttributeError, match='missing mandatory resources of object 1: 0,1'):
+        model.check_instance(1, {6: False, 7: 'U'})
+    with pytest.raises(AttributeError, match='executable'):
+        model.check_instance(1, {**SERVER, 8: 'x'})
+    with pytest.raises(AttributeError, match='undefined resource'):
+        model.check_instance(1, {**SERVER, 99: 1})
+
+
+def test_create_decodes_tlv_instances(handler, model):
+    response = create(handler, ('1',), tlv_instances((4, SERVER), (5, {**SERVER, 0: 3})))
+    assert response.code == Code.CREATED
+    assert tuple(response.opt.location_path) == ('1', '4')
+    assert model.instances(1) == [0, 4, 5]
+    assert model.resource(1, 5, 0) == 3 and model.resource(1, 5, 7) == 'U'
+    assert handler.site.created == [('1', '4'), ('1', '5')]
+
+
+def test_create_resources_only_picks_instance_id(handler, model):
+    response = create(handler, ('1',), tlv_instance(SERVER))
+    assert response.code == Code.CREATED
+    assert tuple(response.opt.location_path) == ('1', '1')
+
+
+@pytest.mark.parametrize('path, payload, code', [
+    (('1',), b'', Code.BAD_REQUEST),  # mandatory resources missing
+    (('1',), tlv_instances((4, SERVER), (4, SERVER)), Code.BAD_REQUEST),  # duplicate instance
+    (('1',), tlv_instances((4, SERVER), (5, {**SERVER, 8: 'x'})), Code.BAD_REQUEST),
+    (('2',), tlv_instances((0, {0: 1, 1: 0, 3: 1}), (0, {0: 1, 1: 0, 3: 1})), Code.BAD_REQUEST),
+    (('0',), tlv_instance(SERVER), Code.METHOD_NOT_ALLOWED),
+    (('42',), tlv_instance(SERVER), Code.NOT_FOUND),
+])
+def test_failed_create_is_rolled_back(handler, model, path, payload, code):
+    _links = model.object_links()
+    _index = {obj: list(insts) for obj, insts in model.index.items()}
+    assert create(handler, path, payload).code == code
+    assert model.index == _index
+    assert model.object_links() == _links
+    assert handler.site.created == []
+
+
+@pytest.mark.parametrize('path, code', [
+    (('3', '0'), Code.METHOD_NOT_ALLOWED),
+    (('0', '0'), Code.METHOD_NOT_ALLOWED),
+    (('1',), Code.METHOD_NOT_ALLOWED),
+    (('1', '7'), Code.NOT_FOUND),
+])
+def test_delete_rejected(handler, model, path, code):
+    assert handler.handle_delete(path).code == code
+    assert model.instances(3) == [0]
+    assert handler.site.deleted == []
+
+
+def test_delete(handler, model):
+    assert handler.handle_delete(('1', '0')).code == Code.DELETED
+    assert model.instances(1) == []
+    assert handler.site.deleted == [('1', '0', [0, 1, 2, 3, 4, 5, 6, 7, 8])]
+    assert model.object_links() == '</1>,</3/0>,</5/0>,</6/0>'
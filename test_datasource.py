@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import socket
+
+import pytest
+
+from datasource import DataSourceManager, FileTailSource, IteratorSource, SocketSource
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    # model files are loaded relative to the working directory
+    monkeypatch.chdir(HERE)
+    from model import ClientModel
+    return ClientModel()
+
+
+def collect(manager, path, value):
+    source = IteratorSource(path, [])
+    source.queue.put_nowait(value)
+    manager.sources = [source]
+    return manager.collect()
+
+
+@pytest.mark.parametrize('path, value, expected', [
+    (('3', '0', '9'), 73.6, 74),  # integer: battery level from a float waveform
+    (('3', '0', '13'), 1.7e9, 1700000000),  # time
+    (('3', '0', '9'), '42', 42),  # text is decoded according to the type
+    (('3', '0', '15'), 5, '5'),  # string
+    (('1', '0', '6'), 1, True),  # boolean
+])
+def test_values_converted_to_resource_type(model, path, value, expected):
+    _obj, _inst, _res = path
+    result = collect(DataSourceManager(model), path, value)[_obj][_inst][_res]
+    assert result == expected and type(result) is type(expected)
+
+
+def test_invalid_value_dropped(model):
+    assert collect(DataSourceManager(model), ('3', '0', '9'), 'full') == dict()
+
+
+def test_value_of_deleted_instance_dropped(model):
+    manager = DataSourceManager(model)
+    model.delete_instance(6, 0)
+    assert collect(manager, ('6', '0', '0'), 52.5) == dict()
+
+
+def test_only_newest_pending_value_collected(model):
+    source = IteratorSource(('3', '0', '9'), [], maxsize=3)
+    for value in (10, 20, 30):
+        source.queue.put_nowait(value)
+    assert source.pending() == 30
+    assert source.pending() is None
+
+
+def test_single_model_write_and_notification_per_tick(model, monkeypatch):
+    manager = DataSourceManager(model, tick=0.05)
+    manager.add_source(IteratorSource(('3', '0', '9'), [50], interval=0))
+    manager.add_source(IteratorSource(('3', '0', '13'), [1000], interval=0))
+    applied = list()
+    _apply = model.apply
+    monkeypatch.setattr(model, 'apply', lambda data: applied.append(data) or _apply(data))
+    notified = list()
+    manager.observe(('3', '0'), lambda: notified.append('/3/0'))
+    manager.observe(('3', '0', '9'), lambda: notified.append('/3/0/9'))
+
+    async def _run():
+        manager.start()
+        await asyncio.sleep(0.12)
+        manager.stop()
+
+    run(_run())
+    assert applied == [{'3': {'0': {'9': 50, '13': 1000}}}]
+    assert sorted(notified) == ['/3/0', '/3/0/9']
+    assert model.resource(3, 0, 9) == 50
+
+    # a cancelled observation is not notified anymore
+    manager.observe(('3', '0'), None, cancel=True)
+    manager.notify({'3': {'0': {'9': 51}}})
+    assert sorted(notified) == ['/3/0', '/3/0/9', '/3/0/9']
+
+
+def test_socket_source_retries_until_server_is_up():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    source = SocketSource(('3', '0', '9'), host='127.0.0.1', port=port)
+    source.retry_min = 0.05
+
+    async def _serve(reader, writer):
+        writer.write(b'42\n')
+        await writer.drain()
+        writer.close()
+
+    async def _run():
+        values = source.values()
+        first = asyncio.ensure_future(values.__anext__())
+        # connection refused, the source keeps retrying
+        await asyncio.sleep(0.2)
+        assert not first.done()
+        server = await asyncio.start_server(_serve, '127.0.0.1', port)
+        try:
+            return await asyncio.wait_for(first, 5)
+        finally:
+            await values.aclose()
+            server.close()
+
+    assert run(_run()) == '42'
+
+
+def test_file_tail_source_follows_missing_truncated_and_rotated_file(tmp_path):
+    filename = str(tmp_path / 'battery')
+    source = FileTailSource(('3', '0', '9'), filename, poll=0.02)
+    source.retry_min = 0.05
+    received = list()
+
+    async def _write(text, mode='a'):
+        with open(filename, mode) as f:
+            f.write(text)
+        await asyncio.sleep(0.3)
+
+    async def _run():
+        task = asyncio.ensure_future(_collect())
+        await asyncio.sleep(0.1)
+        await _write('1\n')  # created after start
+        await _write('2\n')  # appended
+        await _write('3\n', 'w')  # truncated
+        os.rename(filename, filename + '.1')
+        await _write('4\n')  # rotated
+        task.cancel()
+
+    async def _collect():
+        async for value in source.values():
+            received.append(value)
+
+    run(_run())
+    assert received == ['1', '2', '3', '4']
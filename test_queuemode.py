@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+
+from queuemode import NotificationQueue
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_newest_notification_wins():
+    queue = NotificationQueue(maxsize=4)
+    sent = list()
+    queue.put(('3', '0', '13'), lambda: sent.append('old'))
+    queue.put((3, 0, 9), lambda: sent.append('battery'))
+    queue.put((3, 0, 13), lambda: sent.append('new'))
+    assert len(queue) == 2
+    assert queue.flush() == 2
+    assert sent == ['battery', 'new']
+    assert len(queue) == 0 and queue.dropped == 0
+
+
+def test_oldest_path_dropped_when_full():
+    queue = NotificationQueue(maxsize=2)
+    sent = list()
+    for res in ('9', '13', '10'):
+        queue.put(('3', '0', res), lambda res=res: sent.append(res))
+    assert len(queue) == 2
+    assert queue.dropped == 1
+    assert queue.flush() == 2
+    assert sent == ['13', '10']
+
+
+async def simulate(binding, rate, duration, awake_time, sleep_time):
+    # a registered client notifying /3/0/13 at a fixed rate, registration updates always succeed
+    from aiocoap.message import Message
+    from aiocoap.numbers.codes import Code
+    from client import Client
+    from model import ClientModel
+
+    client = Client(model=ClientModel(), binding=binding, awake_time=awake_time, sleep_time=sleep_time)
+
+    async def send_update(links=False):
+        client.stats.count('update')
+        return Message(code=Code.CHANGED)
+
+    client.send_update = send_update
+    client.stats.count('register')
+    client.awake()
+    for _ in range(int(rate * duration)):
+        client.notify(('3', '0', '13'), lambda: None)
+        await asyncio.sleep(1.0 / rate)
+    if client.sleep_handle is not None:
+        client.sleep_handle.cancel()
+    return client.stats
+
+
+def compare(rate=10.0, duration=3.0, awake_time=0.5, sleep_time=1.0):
+    """Packets per hour of the same notification rate in binding modes U and UQ."""
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return {binding: loop.run_until_complete(simulate(binding, rate, duration, awake_time, sleep_time))
+                for binding in ('U', 'UQ')}
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def test_queue_mode_sends_fewer_packets(monkeypatch):
+    # model files are loaded relative to the working directory
+    monkeypatch.chdir(HERE)
+    stats = compare()
+    # U: registration and one packet per notification
+    assert stats['U'].counts == {'register': 1, 'notify': 30}
+    # UQ: notifications while asleep are merged into a single one per wake-up
+    assert stats['UQ'].counts['notify'] < stats['U'].counts['notify']
+    assert stats['UQ'].counts['update'] >= 1
+    assert stats['UQ'].total() < stats['U'].total()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('queuemode-compare')
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help='Notifications per second')
+    parser.add_argument('--duration', type=float, default=30.0,
+                        help='Seconds to run each mode')
+    parser.add_argument('--awake-time', type=float, default=0.5,
+                        help='Queue mode: seconds the client stays awake after a registration update')
+    parser.add_argument('--sleep-time', type=float, default=2.0,
+                        help='Queue mode: seconds between wake-ups to flush queued notifications')
+    args = parser.parse_args()
+
+    os.chdir(HERE)
+    for binding, stats in compare(args.rate, args.duration, args.awake_time, args.sleep_time).items():
+        # rates of the simulated run, independent of the wall clock the client saw
+        print(f'{binding:<2} packets={stats.total():<6} {stats.total() * 3600.0 / args.duration:10.1f}/h '
+              + ' '.join(f'{k}={v}' for k, v in stats.counts.items()))